@@ -1,7 +1,9 @@
 import xarray as xr
 import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
 import numpy as np
 import os
+import dask
 
 # --- CONFIGURATION ---
 # Folder where you put the 3 CMEMS .nc files
@@ -21,66 +23,95 @@ lon_slice = slice(72.0, 73.5)
 # --- STEP 1: LOAD AND MERGE DATASETS ---
 print("Loading 3D Biogeochemical Data...")
 
-datasets = []
-for key, fname in files.items():
-    path = os.path.join(data_folder, fname)
+paths = [os.path.join(data_folder, fname) for fname in files.values()]
+for path in paths:
     if not os.path.exists(path):
-        print(f"Error: File {fname} not found in {data_folder}")
+        print(f"Error: File {os.path.basename(path)} not found in {data_folder}")
         exit()
-    
-    # Open dataset
-    ds = xr.open_dataset(path)
-    datasets.append(ds)
 
-# Merge into one big dataset
+# Open all files in one go and merge them
 # They should align automatically on time/depth/lat/lon
+# Data stays lazy (dask chunks) until the metrics below are computed
 try:
-    ds_merged = xr.merge(datasets)
+    ds_merged = xr.open_mfdataset(paths, combine='by_coords', join='outer', parallel=True, engine='netcdf4',
+                                  chunks={'time': 50, 'depth': -1})
     print("Successfully merged 3D datasets.")
 except Exception as e:
     print(f"Merge error: {e}")
     exit()
 
 # Extract Ratnagiri Zone
+# Resolve the lat/lon slices to integer bounds once (both axes are ascending)
 print("Extracting Ratnagiri Zone Data...")
-ratnagiri = ds_merged.sel(latitude=lat_slice, longitude=lon_slice)
+lat = ds_merged.latitude.values
+lon = ds_merged.longitude.values
+iselect = {
+    'latitude': slice(np.searchsorted(lat, lat_slice.start, side='left'),
+                      np.searchsorted(lat, lat_slice.stop, side='right')),
+    'longitude': slice(np.searchsorted(lon, lon_slice.start, side='left'),
+                       np.searchsorted(lon, lon_slice.stop, side='right'))
+}
+# Keep the small zone cube in memory so every metric below reuses the same decoded chunks
+ratnagiri = ds_merged[['nppv', 'no3', 'o2']].isel(**iselect).persist()
+
+# Same for the 0-100m photic layer on the (ascending) depth axis
+depth = ds_merged.depth.values
+photic = slice(np.searchsorted(depth, 0, side='left'), np.searchsorted(depth, 100, side='right'))
 
 # --- STEP 2: CALCULATE 3D METRICS ---
 print("Calculating Integrated Water Column Metrics...")
 
-# 2a. Total Integrated Production (0m to 100m)
-# We select depth up to ~100m (Photic Zone) and sum it up
-# Note: Check unit conversion if needed (mg/m3 -> mg/m2), here we do a simple sum proxy
-npp_integrated = ratnagiri['nppv'].sel(depth=slice(0, 100)).sum(dim='depth').mean(dim=['latitude', 'longitude'])
+# Build all per-pixel metrics first, then average them over the zone in one reduction
+metrics = xr.Dataset({
+    # 2a. Total Integrated Production (0m to 100m)
+    # We select depth up to ~100m (Photic Zone) and sum it up
+    # Note: Check unit conversion if needed (mg/m3 -> mg/m2), here we do a simple sum proxy
+    'npp_integrated': ratnagiri['nppv'].isel(depth=photic).sum(dim='depth'),
+
+    # 2b. Surface vs Deep Nitrate (Upwelling Check)
+    'no3_surface': ratnagiri['no3'].sel(depth=0.49, method='nearest').drop_vars('depth'),
+    'no3_deep': ratnagiri['no3'].sel(depth=100, method='nearest').drop_vars('depth'),
+
+    # 2c. Deep Oxygen (Hypoxia Check)
+    # Check Oxygen at 30m-50m (common fish habitat)
+    'o2_deep': ratnagiri['o2'].sel(depth=50, method='nearest').drop_vars('depth')
+})
 
-# 2b. Surface vs Deep Nitrate (Upwelling Check)
-no3_surface = ratnagiri['no3'].sel(depth=0.49, method='nearest').mean(dim=['latitude', 'longitude'])
-no3_deep = ratnagiri['no3'].sel(depth=100, method='nearest').mean(dim=['latitude', 'longitude'])
+# Average over the zone; still lazy, nothing is computed yet
+zone_means = metrics.mean(dim=('latitude', 'longitude'), skipna=True)
 
-# 2c. Deep Oxygen (Hypoxia Check)
-# Check Oxygen at 30m-50m (common fish habitat)
-o2_deep = ratnagiri['o2'].sel(depth=50, method='nearest').mean(dim=['latitude', 'longitude'])
+npp_integrated = zone_means['npp_integrated']
+no3_surface = zone_means['no3_surface']
+no3_deep = zone_means['no3_deep']
+o2_deep = zone_means['o2_deep']
 
 # --- STEP 3: VISUALIZATION ---
+# Evaluate all four metrics on one dask graph, so they share the persisted chunks and run in parallel
+npp_integrated, no3_surface, no3_deep, o2_deep = dask.compute(
+    npp_integrated, no3_surface, no3_deep, o2_deep, scheduler='threads', num_workers=os.cpu_count())
+
+# All four series share one time axis: convert it to matplotlib date numbers once
+t = mdates.date2num(npp_integrated.time.values)
+
 fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(10, 12), sharex=True)
 
 # Plot 1: The "True" Food Supply (Integrated Production)
-ax1.plot(npp_integrated.time, npp_integrated, color='green', linewidth=2, label='Total Water Column Production (0-100m)')
+ax1.plot(t, npp_integrated.values, color='green', linewidth=2, label='Total Water Column Production (0-100m)')
 ax1.set_title("1. True Fish Carrying Capacity (Integrated NPP)", fontweight='bold')
 ax1.set_ylabel("Production Proxy (Sum mg/m3)", fontsize=10)
 ax1.grid(True, alpha=0.3)
 ax1.legend()
 
 # Plot 2: The Nutrient Engine (Surface vs Deep)
-ax2.plot(no3_deep.time, no3_deep, color='purple', linestyle='--', label='Deep Nitrate (Reserve)')
-ax2.plot(no3_surface.time, no3_surface, color='blue', label='Surface Nitrate (Available)')
+ax2.plot(t, no3_deep.values, color='purple', linestyle='--', label='Deep Nitrate (Reserve)')
+ax2.plot(t, no3_surface.values, color='blue', label='Surface Nitrate (Available)')
 ax2.set_title("2. Upwelling Diagnostics (Nutrient Pump)", fontweight='bold')
 ax2.set_ylabel("Nitrate (mmol/m3)", fontsize=10)
 ax2.grid(True, alpha=0.3)
 ax2.legend()
 
 # Plot 3: The Oxygen Limit
-ax3.plot(o2_deep.time, o2_deep, color='red', label='Oxygen at 50m')
+ax3.plot(t, o2_deep.values, color='red', label='Oxygen at 50m')
 # Hypoxia threshold is approx 60 mmol/m3 (depends on species, approx 2 mg/L)
 ax3.axhline(y=60, color='black', linestyle=':', label='Hypoxia Threshold')
 ax3.set_title("3. Habitat Viability (Oxygen)", fontweight='bold')
@@ -88,6 +119,10 @@ ax3.set_ylabel("Dissolved O2 (mmol/m3)", fontsize=10)
 ax3.grid(True, alpha=0.3)
 ax3.legend()
 
+# Shared x-axis: format as dates and fix the limits once (no x autoscale per panel)
+ax1.xaxis_date()
+ax1.set_xlim(t[0], t[-1])
+
 plt.tight_layout()
 plt.show()
 
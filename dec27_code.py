@@ -1,5 +1,6 @@
 import xarray as xr
 import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
 import numpy as np
 import os
 
@@ -75,6 +76,15 @@ def extract_and_process(fname, var_name, label):
         return None, None
 
 
+def depth_slice(da, top, bottom):
+    """
+    Resolve a top-bottom depth range (m) to an integer slice of the ascending depth axis.
+    Returns: slice for use with .isel(depth=...)
+    """
+    depths = da.depth.values
+    return slice(np.searchsorted(depths, top, side='left'), np.searchsorted(depths, bottom, side='right'))
+
+
 # --- STEP 1: PROCESS PRODUCTION (NPP) ---
 print("\n" + "─"*70)
 print("1. PROCESSING PRODUCTIVITY (NPP)")
@@ -85,19 +95,28 @@ integrated_npp = None
 if npp_subset is not None:
     try:
         # Select 0-100m depth range
-        npp_100m = npp_subset.sel(depth=slice(0, 100))
+        npp_100m = npp_subset.isel(depth=depth_slice(npp_subset, 0, 100))
         
-        # Check if data has variation (not all zeros/NaN)
-        if npp_100m.mean().values == 0 or np.isnan(npp_100m.mean().values):
+        # Check if data has variation (not all zeros/NaN), scanning the values only once
+        npp_values = npp_100m.values
+        has_signal = bool(np.any(np.where(np.isnan(npp_values), 0, npp_values) != 0))
+        if not has_signal:
             print("   ⚠️  NPP data is all zeros/NaN - trying alternative...")
             # Fallback: try using chlorophyll instead
             chl_subset, _ = extract_and_process(files['bio'], 'chl', 'Chlorophyll')
             if chl_subset is not None:
                 print("   ✅ Using chlorophyll as productivity proxy")
-                npp_100m = chl_subset.sel(depth=slice(0, 100))
+                npp_100m = chl_subset.isel(depth=depth_slice(chl_subset, 0, 100))
         
         # Integrate over depth (trapezoidal rule)
-        integrated_npp = npp_100m.integrate(coord='depth')
+        # Depth levels are fixed, so build the trapezoid weights once and do a single weighted sum.
+        # skipna=False keeps integrate()'s behaviour: columns cut short by the seafloor stay NaN
+        depths = npp_100m.depth.values
+        w = np.zeros_like(depths)
+        w[1:] += 0.5 * np.diff(depths)
+        w[:-1] += 0.5 * np.diff(depths)
+        w_da = xr.DataArray(w, dims='depth', coords={'depth': npp_100m.depth})
+        integrated_npp = (npp_100m * w_da).sum(dim='depth', skipna=False)
         
         # Average over space
         integrated_npp = integrated_npp.mean(dim=['latitude', 'longitude'], skipna=True)
@@ -176,11 +195,16 @@ if integrated_npp is None and surf_no3 is None and deep_o2 is None:
     print("   Check your lat/lon bounds or data files.")
     exit()
 
+# Convert each time axis to matplotlib date numbers once (NO3 surface/deep share one axis)
+t_npp = mdates.date2num(integrated_npp.time.values) if integrated_npp is not None else None
+t_no3 = mdates.date2num(deep_no3.time.values) if surf_no3 is not None and deep_no3 is not None else None
+t_o2 = mdates.date2num(deep_o2.time.values) if deep_o2 is not None else None
+
 fig, (ax1, ax2, ax3) = plt.subplots(3, 1, figsize=(12, 12), sharex=True)
 
 # Plot 1: NPP
 if integrated_npp is not None:
-    ax1.plot(integrated_npp.time, integrated_npp, color='darkgreen', 
+    ax1.plot(t_npp, integrated_npp.values, color='darkgreen', 
              linewidth=2.5, label='Integrated NPP (0-100m)')
     ax1.axhline(y=integrated_npp.mean(), color='gray', linestyle='--', 
                 alpha=0.5, label='Annual Mean')
@@ -195,11 +219,11 @@ else:
 
 # Plot 2: Nitrate
 if surf_no3 is not None and deep_no3 is not None:
-    ax2.plot(deep_no3.time, deep_no3, color='navy', linewidth=2.5, 
+    ax2.plot(t_no3, deep_no3.values, color='navy', linewidth=2.5, 
              linestyle='--', label='Deep NO₃ (100m)')
-    ax2.plot(surf_no3.time, surf_no3, color='cyan', linewidth=2.5, 
+    ax2.plot(t_no3, surf_no3.values, color='cyan', linewidth=2.5, 
              label='Surface NO₃')
-    ax2.fill_between(deep_no3.time, surf_no3, deep_no3, alpha=0.2, 
+    ax2.fill_between(t_no3, surf_no3.values, deep_no3.values, alpha=0.2, 
                       color='blue', label='Upwelling Potential')
     ax2.set_title("Upwelling Diagnostics (Nutrient Gradient)", fontweight='bold', fontsize=13)
     ax2.set_ylabel("Nitrate (mmol m⁻³)", fontsize=11)
@@ -212,13 +236,13 @@ else:
 
 # Plot 3: Oxygen
 if deep_o2 is not None:
-    ax3.plot(deep_o2.time, deep_o2, color='crimson', linewidth=2.5, 
+    ax3.plot(t_o2, deep_o2.values, color='crimson', linewidth=2.5, 
              label='O₂ at 50m')
     ax3.axhline(y=60, color='darkred', linestyle=':', linewidth=2, 
                 label='Hypoxia Threshold')
     ax3.axhline(y=120, color='orange', linestyle=':', linewidth=1.5, 
                 label='Stress Level')
-    ax3.fill_between(deep_o2.time, 0, deep_o2, where=(deep_o2 < 60), 
+    ax3.fill_between(t_o2, 0, deep_o2.values, where=(deep_o2.values < 60), 
                       alpha=0.3, color='red')
     ax3.set_title("Habitat Oxygen Levels (50m Depth)", fontweight='bold', fontsize=13)
     ax3.set_ylabel("Dissolved O₂ (mmol m⁻³)", fontsize=11)
@@ -230,6 +254,11 @@ else:
              transform=ax3.transAxes, fontsize=12, color='red')
     ax3.set_title("Habitat Oxygen - DATA UNAVAILABLE", fontweight='bold')
 
+# Shared x-axis: format as dates and fix the limits once (no x autoscale per panel)
+t_all = [t for t in (t_npp, t_no3, t_o2) if t is not None]
+ax1.xaxis_date()
+ax1.set_xlim(min(t[0] for t in t_all), max(t[-1] for t in t_all))
+
 plt.tight_layout()
 plt.savefig('ratnagiri_biogeochem_robust.png', dpi=300, bbox_inches='tight')
 print("✅ Plot saved: ratnagiri_biogeochem_robust.png")
@@ -5,9 +5,13 @@ import glob
 import os
 import numpy as np
 import re
+import json
 
 # --- CONFIGURATION ---
 data_folder = "Data/Modis CHL reading/*.nc" 
+# Weekly cache, written next to the .nc files on the first run
+cache_name = "chlor_weekly.zarr"
+manifest_name = "chlor_weekly_manifest.json"
 
 # Economic Zones (Lat/Lon)
 zones = {
@@ -25,40 +29,106 @@ BASELINE_CHL = 2.0
 # 0.8 means a 10% drop in algae leads to an 8% drop in fish biomass (trophic transfer efficiency proxy)
 TROPHIC_SENSITIVITY = 0.8 
 
-# --- STEP 1: LOAD DATA (Sequential Method) ---
+# --- HELPER FUNCTIONS ---
+DATE_RE = re.compile(r'(2025)(\d{2})(\d{2})')  # YYYYMMDD
+JULIAN_RE = re.compile(r'(2025)(\d{3})')        # Julian Day YYYYDDD
+
+def parse_timestamp(filename):
+    """Extract the date (YYYYMMDD, else Julian YYYYDDD) from a MODIS filename, or None if neither is valid."""
+    for pattern, fmt in ((DATE_RE, '%Y%m%d'), (JULIAN_RE, '%Y%j')):
+        match = pattern.search(filename)
+        if match is None:
+            continue
+        try:
+            return pd.to_datetime(match.group(0), format=fmt)
+        except ValueError:
+            continue
+    return None
+
+def add_time(ds):
+    """Add a time dimension to a single file, using the date in its filename."""
+    return ds.expand_dims(time=[parse_timestamp(os.path.basename(ds.encoding['source']))])
+
+def can_open(f):
+    """True if the file opens as NetCDF (reads the header only); prints why it is skipped otherwise."""
+    try:
+        xr.open_dataset(f, engine='netcdf4').close()
+        return True
+    except Exception as e:
+        print(f"Skipping {f} due to error: {e}")
+        return False
+
+def build_zone_mask(lat, lon, zones):
+    """Label each (lat, lon) pixel with its zone index (-1 outside all zones). lat runs North -> South."""
+    zone_id = np.full((lat.size, lon.size), -1, dtype=np.int8)
+    for z, bounds in enumerate(zones.values()):
+        i0, i1 = np.searchsorted(-lat.values, -bounds['lat'].start, 'left'), np.searchsorted(-lat.values, -bounds['lat'].stop, 'right')
+        j0, j1 = np.searchsorted(lon.values, bounds['lon'].start, 'left'), np.searchsorted(lon.values, bounds['lon'].stop, 'right')
+        zone_id[i0:i1, j0:j1] = z
+    return xr.DataArray(zone_id, dims=('lat', 'lon'), coords={'lat': lat, 'lon': lon}, name='zone')
+
+def read_weekly_cache(cache_path, manifest_path, manifest):
+    """Reopen the weekly cube from the Zarr cache, or None if it is missing or the inputs changed."""
+    if not (os.path.exists(cache_path) and os.path.exists(manifest_path)):
+        return None
+    try:
+        with open(manifest_path) as fh:
+            if json.load(fh) != manifest:
+                return None
+        return xr.open_zarr(cache_path)['chlor_a']
+    except Exception as e:
+        print(f"Warning: Could not read cache {cache_path}: {e}")
+        return None
+
+def write_weekly_cache(ds_weekly, cache_path, manifest_path, manifest):
+    """Store the weekly cube as Zarr and reopen it; falls back to ds_weekly if writing fails."""
+    try:
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path) # Never reuse a half-written store
+        ds_weekly.chunk({'time': -1, 'lat': 256, 'lon': 256}).to_dataset(name='chlor_a').to_zarr(
+            cache_path, mode='w', consolidated=True, zarr_format=2)
+        with open(manifest_path, 'w') as fh:
+            json.dump(manifest, fh)
+        return xr.open_zarr(cache_path)['chlor_a']
+    except Exception as e:
+        print(f"Warning: Could not write cache {cache_path}: {e}")
+        return ds_weekly
+
+# --- STEP 1: LOAD DATA (Parallel Method) ---
 print("Loading satellite data for prediction model...")
 if os.path.isdir(data_folder):
     data_folder = os.path.join(data_folder, "*.nc")
 file_list = sorted(glob.glob(data_folder))
 file_list = [f for f in file_list if os.path.isfile(f)]
+file_list = [f for f in file_list if parse_timestamp(os.path.basename(f)) is not None]
 
 if not file_list:
     print("Error: No files found.")
     exit()
 
-datasets = []
-for f in file_list:
-    try:
-        ds_i = xr.open_dataset(f, engine='netcdf4')
-        filename = os.path.basename(f)
-        match = re.search(r'(2025)(\d{2})(\d{2})', filename) 
-        match_julian = re.search(r'(2025)(\d{3})', filename)
-        
-        timestamp = None
-        if match:
-            timestamp = pd.to_datetime(match.group(0), format='%Y%m%d')
-        elif match_julian:
-            timestamp = pd.to_datetime(int(match_julian.group(1)) * 1000 + int(match_julian.group(2)), format='%Y%j')
-        
-        if timestamp:
-            ds_i = ds_i.expand_dims(time=[timestamp])
-            datasets.append(ds_i)
-    except:
-        continue
+# Reuse the weekly averages from a previous run if none of the input files changed
+cache_path = os.path.join(os.path.dirname(data_folder), cache_name)
+manifest_path = os.path.join(os.path.dirname(data_folder), manifest_name)
+manifest = {os.path.basename(f): os.path.getmtime(f) for f in file_list}
+ds_weekly = read_weekly_cache(cache_path, manifest_path, manifest)
 
-ds = xr.concat(datasets, dim='time').sortby('time')
-# Resample to weekly to smooth noise
-ds_weekly = ds['chlor_a'].resample(time='1W').mean(skipna=True)
+if ds_weekly is None:
+    # Drop unreadable files up front, so one bad file does not stop the whole load
+    readable_files = [f for f in file_list if can_open(f)]
+    if not readable_files:
+        print("Error: No readable files found.")
+        exit()
+
+    try:
+        ds = xr.open_mfdataset(readable_files, preprocess=add_time, combine='nested', concat_dim='time',
+                               parallel=True, engine='netcdf4', chunks={'time': 1}).sortby('time')
+    except Exception as e:
+        print(f"Critical Error loading files: {e}")
+        print("Tip: Ensure files are uniform and filenames have dates.")
+        exit()
+    # Resample to weekly to smooth noise
+    ds_weekly = ds['chlor_a'].resample(time='1W').mean(skipna=True)
+    ds_weekly = write_weekly_cache(ds_weekly, cache_path, manifest_path, manifest)
 
 # --- STEP 2: RUN PREDICTION MODEL ---
 print("\n--- RUNNING FISHERIES PREDICTION SIMULATION ---")
@@ -71,17 +141,26 @@ colors = {'Mumbai': 'blue', 'Ratnagiri': 'orange', 'Sindhudurg': 'green'}
 
 prediction_report = []
 
-for zone_name, bounds in zones.items():
+# Spatial average of every zone in one grouped pass over the pixels
+zone_id = build_zone_mask(ds_weekly.lat, ds_weekly.lon, zones)
+zone_means = ds_weekly.stack(px=('lat', 'lon')).groupby(zone_id.stack(px=('lat', 'lon'))).mean(skipna=True)
+zone_means = zone_means.reindex(zone=range(len(zones))).load()
+zone_means = zone_means.assign_coords(zone=list(zones))
+
+# Index range of the Critical "Bloom Period" (Oct-Nov) on the weekly time axis, found once for all zones
+times = ds_weekly.time.values.astype('datetime64[ns]')
+t0 = np.searchsorted(times, np.datetime64('2025-10-01', 'ns'), side='left')
+t1 = np.searchsorted(times, np.datetime64('2025-11-30', 'ns'), side='right')
+
+for zone_name in zones:
     # 1. Extract Zone Data
-    zone_data = ds_weekly.sel(lat=bounds['lat'], lon=bounds['lon'])
-    ts = zone_data.mean(dim=['lat', 'lon'], skipna=True)
+    ts = zone_means.sel(zone=zone_name)
+    ts_vals = ts.values
     
     # 2. Isolate the Critical "Bloom Period" (Oct-Nov) for Prediction
     # We only care about the bloom failure for the forecast
-    bloom_period = ts.sel(time=slice('2025-10-01', '2025-11-30'))
-    
-    if len(bloom_period) > 0:
-        avg_observed_chl = bloom_period.mean().values
+    if t1 > t0:
+        avg_observed_chl = np.nanmean(ts_vals[t0:t1])
     else:
         avg_observed_chl = 0.0 # No data in bloom period
         
@@ -106,10 +185,12 @@ for zone_name, bounds in zones.items():
         "Yield_Forecast": yield_gap_percent
     })
 
-    # 5. Plotting
-    ax.plot(ts.time, ts, label=f"{zone_name} (Observed)", color=colors[zone_name], marker='o', markersize=4)
-
 # --- STEP 3: VISUALIZATION ---
+# Plot all zones in one call, one line per zone
+ax.set_prop_cycle(color=[colors[zone_name] for zone_name in zones])
+zone_means.plot.line(x='time', hue='zone', ax=ax, marker='o', markersize=4, add_legend=False,
+                     label=[f"{zone_name} (Observed)" for zone_name in zones])
+
 # Plot Baseline
 ax.axhline(y=BASELINE_CHL, color='red', linestyle='--', linewidth=2, label=f'Healthy Baseline ({BASELINE_CHL} mg/m³)')
 ax.text(ds_weekly.time[0].values, BASELINE_CHL + 0.1, " Target Productivity", color='red', fontsize=10)
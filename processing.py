@@ -5,6 +5,9 @@ import glob
 import os
 import numpy as np
 import re
+import json
+import netCDF4
+from numba import guvectorize
 
 # --- CONFIGURATION ---
 # 1. Path to your folder containing the 43 .nc files
@@ -19,6 +22,112 @@ zones = {
     "Sindhudurg":  {"lat": slice(16.5, 15.5), "lon": slice(72.0, 73.5)}
 }
 
+# 3. Weekly cache (written next to the .nc files on the first run)
+cache_name = "chlor_weekly.zarr"
+manifest_name = "chlor_weekly_manifest.json"
+
+# --- HELPER FUNCTIONS ---
+# Filename date patterns: YYYYMMDD, with a fallback for Julian Day format YYYYDDD
+DATE_RE = re.compile(r'(2025)(\d{2})(\d{2})')
+JULIAN_RE = re.compile(r'(2025)(\d{3})')
+
+
+def parse_timestamp(filename):
+    """
+    Extract the observation date from a MODIS filename.
+    Returns: pd.Timestamp, or None if the name carries no valid date
+    """
+    # A digit run like 20250010 (YYYYDDD + more digits) matches YYYYMMDD but is not a
+    # valid date, so fall back to the Julian pattern before giving up
+    for pattern, fmt in ((DATE_RE, '%Y%m%d'), (JULIAN_RE, '%Y%j')):
+        match = pattern.search(filename)
+        if match is None:
+            continue
+        try:
+            return pd.to_datetime(match.group(0), format=fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def build_zone_mask(lat, lon, zones):
+    """
+    Label every (lat, lon) pixel with the index of the zone it falls in.
+    Returns: int8 DataArray named 'zone', -1 for pixels outside all zones
+    """
+    zone_id = np.full((lat.size, lon.size), -1, dtype=np.int8)
+    for z, bounds in enumerate(zones.values()):
+        # lat runs North -> South in MODIS files, so search on the negated axis
+        i0 = np.searchsorted(-lat.values, -bounds['lat'].start, side='left')
+        i1 = np.searchsorted(-lat.values, -bounds['lat'].stop, side='right')
+        j0 = np.searchsorted(lon.values, bounds['lon'].start, side='left')
+        j1 = np.searchsorted(lon.values, bounds['lon'].stop, side='right')
+        zone_id[i0:i1, j0:j1] = z
+    return xr.DataArray(zone_id, dims=('lat', 'lon'), coords={'lat': lat, 'lon': lon}, name='zone')
+
+
+# Compiled for MODIS' native float32 and cached to __pycache__, so only the first run pays the JIT cost.
+# One call covers one time step; the parallel target spreads the time steps over all cores.
+# fastmath without 'nnan'/'ninf', so the isnan check on cloud pixels is kept
+@guvectorize(["void(float32[:,:], int8[:,:], int8[:], float32[:])"], "(h,w),(h,w),(z)->(z)",
+             target='parallel', cache=True, fastmath={'nsz', 'arcp', 'contract', 'afn', 'reassoc'})
+def zone_nanmean(a, zone_ids, zone_labels, out):
+    """
+    Average the non-NaN pixels of each zone.
+    a: (lat, lon) array (or (time, lat, lon), broadcast per time step),
+    zone_ids: (lat, lon) mask from build_zone_mask, zone_labels: 0..n_zones-1 (sets the output length),
+    out: receives the mean per zone (NaN for an empty zone)
+    """
+    n_zones = zone_labels.shape[0]
+    sums = np.zeros(n_zones)
+    cnts = np.zeros(n_zones)
+    for h in range(a.shape[0]):
+        for w in range(a.shape[1]):
+            z = zone_ids[h, w]
+            v = a[h, w]
+            if z >= 0 and not np.isnan(v):
+                sums[z] += v
+                cnts[z] += 1
+    for z in range(n_zones):
+        out[z] = sums[z] / cnts[z] if cnts[z] > 0 else np.nan
+
+
+def read_weekly_cache(cache_path, manifest_path, manifest):
+    """
+    Reopen the weekly chlorophyll cube from the Zarr cache.
+    Returns: DataArray, or None if there is no cache or the input files changed
+    """
+    if not (os.path.exists(cache_path) and os.path.exists(manifest_path)):
+        return None
+    try:
+        with open(manifest_path) as fh:
+            if json.load(fh) != manifest:
+                return None
+        return xr.open_zarr(cache_path)['chlor_a']
+    except Exception as e:
+        print(f"Warning: Could not read cache {cache_path}: {e}")
+        return None
+
+
+def write_weekly_cache(ds_weekly, cache_path, manifest_path, manifest):
+    """
+    Store the weekly cube as Zarr, with the input file mtimes used to invalidate it.
+    Returns: the cube reopened from the cache, or ds_weekly if it could not be written
+    """
+    try:
+        # Drop the old manifest first so a half-written store is never reused
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        ds_weekly.chunk({'time': -1, 'lat': 256, 'lon': 256}).to_dataset(name='chlor_a').to_zarr(
+            cache_path, mode='w', consolidated=True, zarr_format=2)
+        with open(manifest_path, 'w') as fh:
+            json.dump(manifest, fh)
+        return xr.open_zarr(cache_path)['chlor_a']
+    except Exception as e:
+        print(f"Warning: Could not write cache {cache_path}: {e}")
+        return ds_weekly
+
+
 # --- STEP 1: LOAD AND MERGE DATA ---
 print("Loading files...")
 
@@ -37,82 +146,124 @@ if not file_list:
     print("Tip: Check your path and ensure files end in .nc")
     exit()
 
-try:
-    # Alternative loading method: Sequential load to avoid 'dask' dependency error
-    print(f"Found {len(file_list)} files. Loading sequentially...")
-    datasets = []
-    
-    for f in file_list:
-        try:
-            # Open individual file (loads into memory, avoiding dask chunks)
-            ds_i = xr.open_dataset(f, engine='netcdf4')
-            
-            # Extract time from filename
+# Reuse the weekly averages from a previous run if none of the input files changed
+cache_path = os.path.join(os.path.dirname(data_folder), cache_name)
+manifest_path = os.path.join(os.path.dirname(data_folder), manifest_name)
+manifest = {os.path.basename(f): os.path.getmtime(f) for f in file_list}
+ds_weekly = read_weekly_cache(cache_path, manifest_path, manifest)
+
+if ds_weekly is not None:
+    print(f"Loaded {len(ds_weekly.time)} weekly averages from cache: {cache_path}")
+else:
+    try:
+        # Read every file straight into one preallocated (time, lat, lon) buffer
+        print(f"Found {len(file_list)} files. Loading sequentially...")
+        dated_files = []
+        times = []
+
+        for f in file_list:
             filename = os.path.basename(f)
-            
-            # Try to find YYYYMMDD
-            match = re.search(r'(2025)(\d{2})(\d{2})', filename) 
-            # Fallback for Julian Day format YYYYDDD
-            match_julian = re.search(r'(2025)(\d{3})', filename)
-            
-            timestamp = None
-            if match:
-                date_str = match.group(0)
-                timestamp = pd.to_datetime(date_str, format='%Y%m%d')
-            elif match_julian:
-                year = int(match_julian.group(1))
-                day_of_year = int(match_julian.group(2))
-                timestamp = pd.to_datetime(year * 1000 + day_of_year, format='%Y%j')
-            
+            timestamp = parse_timestamp(filename)
             if timestamp is not None:
-                # Add time dimension to this single file
-                ds_i = ds_i.expand_dims(time=[timestamp])
-                datasets.append(ds_i)
+                dated_files.append(f)
+                times.append(timestamp)
             else:
                 print(f"Warning: Could not parse date from {filename}, skipping.")
-                
-        except Exception as e:
-            print(f"Skipping {f} due to error: {e}")
-            continue
 
-    if not datasets:
-        print("Error: No valid datasets could be loaded.")
-        exit()
+        if not dated_files:
+            print("Error: No valid datasets could be loaded.")
+            exit()
+
+        # Ensure chronological order. The sorted glob usually is already (YYYYMMDD / YYYYDDD names);
+        # if not, reorder the file list before reading instead of re-sorting the loaded data
+        times = np.array(times, dtype='datetime64[ns]')
+        if not (np.diff(times) >= np.timedelta64(0)).all():
+            order = np.argsort(times, kind='stable')
+            dated_files = [dated_files[i] for i in order]
+            times = times[order]
+
+        # Peek at the first readable file for the grid and the CF packing attributes
+        for first, f in enumerate(dated_files):
+            try:
+                with netCDF4.Dataset(f) as nc0:
+                    lat = np.asarray(nc0.variables['lat'][:])
+                    lon = np.asarray(nc0.variables['lon'][:])
+                    var0 = nc0.variables['chlor_a']
+                    H, W = var0.shape
+                    raw_dtype = var0.dtype
+                    fill_value = getattr(var0, '_FillValue', None)
+                    scale_factor = getattr(var0, 'scale_factor', 1.0)
+                    add_offset = getattr(var0, 'add_offset', 0.0)
+                break
+            except Exception as e:
+                print(f"Skipping {f} due to error: {e}")
+        else:
+            print("Error: No valid datasets could be loaded.")
+            exit()
+
+        raw = np.empty((len(dated_files), H, W), dtype=raw_dtype)
+        loaded = np.zeros(len(dated_files), dtype=bool)
+
+        # Files before `first` already failed the peek and stay marked as not loaded
+        for i in range(first, len(dated_files)):
+            f = dated_files[i]
+            try:
+                with netCDF4.Dataset(f) as nc:
+                    # Read the stored values as-is; mask and scale are applied once to the whole cube below
+                    nc.set_auto_maskandscale(False)
+                    raw[i] = nc.variables['chlor_a'][:]
+                loaded[i] = True
+            except Exception as e:
+                print(f"Skipping {f} due to error: {e}")
+
+        if not loaded.any():
+            print("Error: No valid datasets could be loaded.")
+            exit()
+        if not loaded.all():
+            raw, times = raw[loaded], times[loaded]
 
-    # Concatenate all loaded files into one dataset
-    ds = xr.concat(datasets, dim='time')
-    ds = ds.sortby('time') # Ensure chronological order
+        # Decode the whole cube in one vectorised pass: scale/offset, then fill value -> NaN
+        # (an unpacked float32 variable is decoded in place, without a second copy)
+        is_fill = raw == fill_value if fill_value is not None else None
+        if scale_factor != 1.0 or add_offset != 0.0:
+            chl = raw * np.float32(scale_factor) + np.float32(add_offset)
+        else:
+            chl = raw.astype(np.float32, copy=False)
+        if is_fill is not None:
+            chl[is_fill] = np.nan
+
+        # Wrap the buffer once as a dataset
+        ds = xr.DataArray(chl, dims=('time', 'lat', 'lon'), coords={'time': times, 'lat': lat, 'lon': lon},
+                          name='chlor_a').to_dataset()
     
-    print(f"Successfully compiled dataset with {len(ds.time)} time steps.")
+        print(f"Successfully compiled dataset with {len(ds.time)} time steps.")
 
-except Exception as e:
-    print(f"Critical Error loading files: {e}")
-    print("Tip: Ensure files are uniform and filenames have dates.")
-    exit()
+    except Exception as e:
+        print(f"Critical Error loading files: {e}")
+        print("Tip: Ensure files are uniform and filenames have dates.")
+        exit()
 
-# --- STEP 2: RESAMPLING (Handling Clouds) ---
-# Resample to Weekly averages to fill gaps
-print("Aggregating data to Weekly averages (filling cloud gaps)...")
-ds_weekly = ds['chlor_a'].resample(time='1W').mean(skipna=True)
+    # --- STEP 2: RESAMPLING (Handling Clouds) ---
+    # Resample to Weekly averages to fill gaps
+    print("Aggregating data to Weekly averages (filling cloud gaps)...")
+    ds_weekly = ds['chlor_a'].resample(time='1W').mean(skipna=True)
+    ds_weekly = write_weekly_cache(ds_weekly, cache_path, manifest_path, manifest)
 
 # --- STEP 3: EXTRACT ZONAL DATA ---
 print("Extracting data for Economic Zones...")
-results = {}
 
-plt.figure(figsize=(12, 6))
+# Average all zones in a single compiled pass over the pixels
+# skipna=True is crucial here to ignore cloud pixels
+zone_id = build_zone_mask(ds_weekly.lat, ds_weekly.lon, zones)
+chl = np.ascontiguousarray(ds_weekly.transpose('time', 'lat', 'lon').values, dtype=np.float32)
+zone_means = zone_nanmean(chl, zone_id.values, np.arange(len(zones), dtype=np.int8))
+zone_means = xr.DataArray(zone_means, dims=('time', 'zone'),
+                          coords={'time': ds_weekly.time, 'zone': list(zones)})
+results = {zone_name: zone_means.sel(zone=zone_name) for zone_name in zones}
 
-for zone_name, bounds in zones.items():
-    # Select the specific lat/lon box
-    zone_data = ds_weekly.sel(lat=bounds['lat'], lon=bounds['lon'])
-    
-    # Calculate the spatial average for that zone over time
-    # skipna=True is crucial here to ignore cloud pixels
-    time_series = zone_data.mean(dim=['lat', 'lon'], skipna=True)
-    
-    results[zone_name] = time_series
-    
-    # Plotting
-    plt.plot(time_series.time, time_series, marker='o', label=zone_name)
+# Plotting: all zones in one call, one line per zone
+plt.figure(figsize=(12, 6))
+zone_means.plot.line(x='time', hue='zone', ax=plt.gca(), marker='o', add_legend=False, label=list(zones))
 
 # --- STEP 4: VISUALIZATION ---
 plt.title("Weekly Chlorophyll-a Concentration (Konkan Coast 2025)\nProxy for Marine Productivity", fontsize=14)
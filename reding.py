@@ -1,5 +1,6 @@
 import xarray as xr
 import matplotlib.pyplot as plt
+import numpy as np
 
 # 1. Load the file
 file_path = 'AQUA_MODIS.20250919.L3m.DAY.CHL.x_chlor_a.nc'
@@ -16,5 +17,10 @@ plt.show()
 
 # 4. To get a specific reading (e.g., near Mumbai/Ratnagiri):
 # You can select by latitude/longitude slice
-subset = chlor_a.sel(lat=slice(17.5, 16.5), lon=slice(72.0, 73.0))
-print(subset.mean().values) # Prints average Chl-a for that area
\ No newline at end of file
+# Find the box indices once (lat runs North -> South in MODIS files, hence the minus sign)
+lat = chlor_a.lat.values
+lon = chlor_a.lon.values
+i0, i1 = np.searchsorted(-lat, -17.5, side='left'), np.searchsorted(-lat, -16.5, side='right')
+j0, j1 = np.searchsorted(lon, 72.0, side='left'), np.searchsorted(lon, 73.0, side='right')
+subset = chlor_a[i0:i1, j0:j1].values
+print(np.nanmean(subset, dtype=np.float64)) # Prints average Chl-a for that area (float64 accumulator)
\ No newline at end of file